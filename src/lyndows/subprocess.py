@@ -22,17 +22,28 @@ from __future__ import annotations
 import logging
 import os
 import shlex
+import string
 import subprocess
 from enum import Enum
 from pathlib import Path
+from types import TracebackType
+from typing import Any
 
-from psutil import Popen
+import psutil
 
-from lyndows.util import FilePath, is_flagexec, is_win32exec, on_windows
+from lyndows.system import wait_pidfd
+from lyndows.util import ON_WINDOWS, FilePath, is_flagexec, is_win32exec
 from lyndows.wine.context import WineContext
 
 logger = logging.getLogger(__name__)
 
+# characters that never need quoting in a shell command line
+_SHELL_SAFE = frozenset(f"{string.ascii_letters}{string.digits}@%+=:,./-_")
+
+
+def _quote_fast(arg: str) -> str:
+    return arg if arg and _SHELL_SAFE.issuperset(arg) else shlex.quote(arg)
+
 
 def command(*args, **kwargs):
     cp = subprocess.run(
@@ -49,10 +60,13 @@ class Program:
         "_proton_mode",
         "_prepend_command",
         "_context",
+        "_command_cache",
+        "_exe_str",
+        "_exe_tokens",
     )
 
     def __init__(self, exe: FilePath, context: WineContext | None = None) -> None:
-        if on_windows():
+        if ON_WINDOWS:
             self._context = None
             self._exe = exe if is_win32exec(exe) else None
         elif not is_win32exec(exe) and is_flagexec(exe):
@@ -66,11 +80,14 @@ class Program:
             self._exe = self._context.dist.check_executable(self._exe)
         if self._exe is None:
             raise ValueError(f"{exe} is not a valid executable.")
+        self._exe_str = os.fspath(self._exe)
+        self._exe_tokens = tuple(self._exe_str.split())
 
         self._use_proton = False
         self._use_steam = False
         self._proton_mode = "runinprefix"
         self._prepend_command = None
+        self._command_cache = None
 
     def use_proton(self, usage: bool = True, mode: str = "runinprefix") -> None:
         if self._context:
@@ -79,19 +96,22 @@ class Program:
                 self._context.STEAM_COMPAT_DATA_PATH = self._context.prefix.root
                 # NOTE: proton expect 'wine' and append '64' after,
                 # so reset it as simply 'wine', ugly but....
-                self._context.__dict__[
-                    "WINELOADER"
-                ] = f"{self._context.dist.winedist}/bin/wine"
+                self._context.set_protected(
+                    "WINELOADER", f"{self._context.dist.winedist}/bin/wine"
+                )
                 if mode in {"runinprefix", "run"}:
                     self._proton_mode = mode
+            self._command_cache = None
 
     def use_steam(self, usage: bool = True) -> None:
         if self._context:
             self._use_steam = usage
+            self._command_cache = None
 
     def prepend_command(self, command: FilePath | None = None) -> None:
         # TODO: verify command
         self._prepend_command = command
+        self._command_cache = None
 
     def get_path(self, path):
         return self._context.prefix.get_windows_path(path) if self._context else path
@@ -114,85 +134,124 @@ class Program:
 
     @property
     def command(self) -> list:
+        return list(self._command())
+
+    def _command(self) -> list:
         # [<command>, [<wine> | <proton>, [<runinprefix> | <run>]], <steam.exe>, <exe>]
+        if self._command_cache is not None:
+            return self._command_cache
         cmd = []
         if self._context:
             if not self._use_proton:
-                cmd.append(str(self._context.dist.loader))
+                cmd.append(os.fspath(self._context.dist.loader))
             else:
-                cmd.extend((str(self._context.dist.proton), self._proton_mode))
+                cmd.extend((os.fspath(self._context.dist.proton), self._proton_mode))
             if self._use_steam and not self._use_proton:
                 cmd.append("c:\\windows\\system32\\steam.exe")
         if self._prepend_command:
-            cmd.insert(0, str(self._prepend_command))
-        cmd.append(str(self._exe))
+            cmd.insert(0, os.fspath(self._prepend_command))
+        cmd.append(self._exe_str)
+        self._command_cache = cmd
         return cmd
 
     def __repr__(self):
-        return str(self._exe)
+        return self._exe_str
 
     def __str__(self):
-        return self.__repr__()
+        return self._exe_str
 
     def __contains__(self, substr):
-        return substr in self.__repr__()
+        return substr in self._exe_str
 
     def __iter__(self):
-        return iter(self.__repr__().split())
+        return iter(self._exe_tokens)
 
 
 ##
 # External process handling
 class Process:
-    __slots__ = ("_program", "_process", "_arguments", "_state", "_env", "_exit_code")
+    __slots__ = (
+        "_program",
+        "_process",
+        "_psprocess",
+        "_arguments",
+        "_state",
+        "_env",
+        "_exit_code",
+        "_compiled_args",
+    )
 
     class STATE(Enum):
         NOT_STARTED = 0
         RUNNING = 1
         STOPPED = 2
 
-    def __init__(self, program, *args, env=None):
+    def __init__(
+        self,
+        program: Program | FilePath,
+        *args: str,
+        env: dict[str, str] | None = None,
+    ) -> None:
         self._program = program if isinstance(program, Program) else Program(program)
+        self._compiled_args = None
         self.set_arguments(*args)
         self._env = env or {}
         self._process = None
+        self._psprocess = None
         self._exit_code = None
         self._state = Process.STATE.NOT_STARTED
 
     def set_arguments(self, *args):
         self._arguments = []
+        self._compiled_args = None
         self.add_arguments(*args)
 
     def add_arguments(self, *args):
         for tup in args:
-            if not (isinstance(tup, tuple) and len(tup) < 3):
+            if type(tup) is not tuple or len(tup) >= 3:
                 raise TypeError(f"args should be tuples('opt', [<value>]):\n {args}")
-            tmp = []
-            for e in tup:
-                if isinstance(e, Path):
-                    e = self._program.get_path(e)
-                tmp.append(str(e))
-            self._arguments += tmp
+        self._compiled_args = None
+        get_path = self._program.get_path
+        self._arguments.extend(
+            e
+            if type(e) is str
+            else os.fspath(get_path(e))
+            if isinstance(e, Path)
+            else str(e)
+            for tup in args
+            for e in tup
+        )
 
     def get_arguments(self):
         return self._arguments
 
     def compile_args(self):
-        return shlex.join(self._program.command + self._arguments)
+        # the program command list is a new object each time
+        # the program is modified, so identity tells if it has changed.
+        command = self._program._command()
+        if self._compiled_args is None or self._compiled_args[0] is not command:
+            args = " ".join([_quote_fast(arg) for arg in command + self._arguments])
+            self._compiled_args = (command, args)
+        return self._compiled_args[1]
+
+    def _compile_env(self, isolation: bool) -> dict[str, str] | None:
+        program_env = self._program.env
+        if isolation:
+            return {**program_env, **self._env}
+        if not (program_env or self._env):
+            # let the child inherit our environment without copying it
+            return None
+        return {**os.environ, **program_env, **self._env}
 
     def run(self, isolation=False, text=True, **kwargs) -> subprocess.CompletedProcess:
         if self._process is not None or self._state != Process.STATE.NOT_STARTED:
             raise RuntimeError("This Process has already been started.")
 
-        args = self.compile_args()
+        args = self._program._command() + self._arguments
         for arg in ("args", "env", "text", "shell"):
             kwargs.pop(arg, None)
 
-        _env = {}
-        if not isolation:
-            _env |= os.environ
-        _env |= self._program.env
-        _env |= self._env
+        _env = self._compile_env(isolation)
 
         codec = "UTF-8" if text else None
 
@@ -203,7 +262,7 @@ class Process:
             text=text,
             encoding=codec,
             check=False,
-            shell=True,
+            shell=False,
             **kwargs,
         )
         self._state = Process.STATE.STOPPED
@@ -216,20 +275,16 @@ class Process:
         elif self._state == Process.STATE.STOPPED:
             raise RuntimeError("This Process has now stopped.")
 
-        args = self._program.command + self._arguments
+        args = self._program._command() + self._arguments
         for arg in ("args", "env", "text", "shell", "executable"):
             kwargs.pop(arg, None)
 
-        _env = {}
-        if not isolation:
-            _env |= os.environ
-        _env |= self._program.env
-        _env |= self._env
+        _env = self._compile_env(isolation)
 
         codec = "UTF-8" if text else None
 
         try:
-            self._process = Popen(
+            self._process = subprocess.Popen(
                 args, env=_env, text=text, encoding=codec, shell=False, **kwargs
             )
         except subprocess.CalledProcessError as e:
@@ -239,6 +294,15 @@ class Process:
         else:
             self._state = Process.STATE.RUNNING
 
+    def _psutil_process(self) -> psutil.Process | None:
+        # psutil is only needed to suspend/resume, so the handle is
+        # created on demand instead of at spawn time.
+        if self._process is None or self._process.poll() is not None:
+            return None
+        if self._psprocess is None:
+            self._psprocess = psutil.Process(self._process.pid)
+        return self._psprocess
+
     def is_running(self) -> bool:
         """Returns if the process is running.
 
@@ -246,7 +310,7 @@ class Process:
         process list. This is reliable also in case the process is gone
         and its PID reused by another process.
         """
-        return self._process.is_running() if self._process else False
+        return self._process.poll() is None if self._process else False
 
     def suspend(self) -> None:
         """Suspend the process.
@@ -254,7 +318,8 @@ class Process:
         Suspend process execution with SIGSTOP signal preemptively
         checking whether PID has been reused.
         """
-        return self._process.suspend() if self._process else None
+        process = self._psutil_process()
+        return process.suspend() if process else None
 
     def resume(self) -> None:
         """Resume the process.
@@ -262,7 +327,8 @@ class Process:
         Suspend process execution with SIGSTOP signal preemptively
         and checking whether PID has been reused.
         """
-        return self._process.resume() if self._process else None
+        process = self._psutil_process()
+        return process.resume() if process else None
 
     def terminate(self) -> None:
         """Terminate the process.
@@ -280,6 +346,19 @@ class Process:
         """
         return self._process.kill() if self._process else None
 
+    def poll(self) -> int | None:
+        """Check if the process has terminated.
+
+        Return the exit code of the process if it has terminated,
+        None otherwise. Once the exit code is known no system call
+        is made anymore.
+        """
+        if self._exit_code is None and self._process is not None:
+            self._exit_code = self._process.poll()
+            if self._exit_code is not None:
+                self._state = Process.STATE.STOPPED
+        return self._exit_code
+
     def wait(self, timeout=None) -> bool | None:
         """Wait for the process to terminate.
 
@@ -289,11 +368,23 @@ class Process:
         the process could be retriewed with the property exit_code.
         """
         if self._process is not None:
+            # a reaped child pid may already belong to another process
+            if (
+                timeout is not None
+                and timeout > 0
+                and self._process.returncode is None
+            ):
+                exited = wait_pidfd(self._process.pid, timeout)
+                if exited is False:
+                    raise subprocess.TimeoutExpired(self._process.args, timeout)
+                if exited:
+                    # the pidfd already waited, just reap the process
+                    timeout = 0
             self._exit_code = self._process.wait(timeout)
             if self._exit_code is None:
                 self._state = Process.STATE.STOPPED
                 return None
-            elif on_windows():
+            elif ON_WINDOWS:
                 return self._exit_code == 0
             else:
                 return self._exit_code >= 0
@@ -326,7 +417,7 @@ class Launcher:
         self,
         context: WineContext | None,
         exe: FilePath,
-        *args: list,
+        *args: str,
         use_proton: bool = False,
         proton_mode: str = "runinprefix",
         use_steam: bool = False,
@@ -335,17 +426,41 @@ class Launcher:
         textmode: bool = True,
         prepend_command: FilePath | None = None,
     ):
-        WineContext.register(context)
-        self.exe = Program(exe, context)
-        self.exe.use_proton(use_proton, mode=proton_mode)
-        self.exe.use_steam(use_steam)
-        self.exe.prepend_command(prepend_command)
-        self.process = Process(self.exe)
-        self.process.set_arguments(*args)
+        # Program and Process are built on first use, resolving the
+        # executable against the prefix is deferred until really needed.
+        self._context = context
+        self._exe = exe
+        self._args = args
+        self._use_proton = use_proton
+        self._proton_mode = proton_mode
+        self._use_steam = use_steam
+        self._prepend_command = prepend_command
+        self._program = None
+        self._process = None
+        # set by a LauncherPool to be told when this launcher runs
+        self._pool: LauncherPool | None = None
         self.hook = hook if hook is not None else BaseHook()
         self.isolation = isolation
         self.textmode = textmode
 
+    @property
+    def exe(self) -> Program:
+        if self._program is None:
+            if self._context is not None:
+                WineContext.register(self._context)
+            program = Program(self._exe, self._context)
+            program.use_proton(self._use_proton, mode=self._proton_mode)
+            program.use_steam(self._use_steam)
+            program.prepend_command(self._prepend_command)
+            self._program = program
+        return self._program
+
+    @property
+    def process(self) -> Process:
+        if self._process is None:
+            self._process = Process(self.exe, *self._args)
+        return self._process
+
     def run(self, nowait: bool = False) -> None:
         with self.hook:
             if not nowait:
@@ -354,10 +469,120 @@ class Launcher:
                 print(cp.stdout)
             else:
                 self.process.popen(self.isolation, self.textmode)
+        if self._pool is not None:
+            self._pool._track(self)
 
     def get_command(self) -> str:
         return self.process.compile_args()
 
     def finished(self) -> bool:
-        # sourcery skip: boolean-if-exp-identity, remove-unnecessary-cast
-        return False if self.process.poll() is None else True  # type: ignore
+        return self.process.poll() is not None
+
+
+class LauncherPool:
+    """Launch programs against a persistent wineserver.
+
+    A LauncherPool keeps a wineserver running in persistent mode for the
+    prefix of its context, so that successive launches don't pay for the
+    wineserver startup and the loading of the prefix registry.
+    If max_tasks is set, the wineserver is restarted once that many
+    launched programs have completed, to bound its memory growth. The
+    restart is deferred while a program launched by the pool is running.
+    """
+
+    def __init__(
+        self,
+        context: WineContext | None = None,
+        timeout: int | None = None,
+        max_tasks: int | None = None,
+    ):
+        ctx = context if context is not None else WineContext.context()
+        if ctx is None:
+            raise RuntimeError("No valid WineContext was found.")
+        self.context: WineContext = ctx
+        if max_tasks is not None and max_tasks < 1:
+            raise ValueError("max_tasks should be a positive integer.")
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self._tasks = 0
+        self._running = False
+        # launched programs not yet seen completed, tracked with max_tasks
+        self._launchers: list[Launcher] = []
+
+    def _server(self, *args: str) -> int | None:
+        process = Process(self.context.dist.server, *args, env=self.context.env)
+        # wineserver detaches in the background but keeps stderr open,
+        # capturing its output would wait for the daemon to exit.
+        process.popen(stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        process.wait()
+        return process.exit_code
+
+    def start(self) -> None:
+        """Start the persistent wineserver if not already started.
+
+        The server stays alive `timeout` seconds after the last wine
+        process exits, or until stop() is called if timeout is None.
+        """
+        if not self._running:
+            persistent = "--persistent"
+            if self.timeout is not None:
+                persistent = f"{persistent}={self.timeout}"
+            # fails if a wineserver is already running for the prefix,
+            # that one is not ours to stop or recycle.
+            if self._server(persistent) == 0:
+                self._running = True
+                self._tasks = 0
+            else:
+                logger.warning("Unable to start a persistent wineserver.")
+
+    def stop(self) -> None:
+        """Kill the wineserver started by this pool."""
+        if self._running:
+            self._server("--kill")
+            self._running = False
+
+    def launcher(self, exe: FilePath, *args: str, **kwargs: Any) -> Launcher:
+        """Returns a Launcher for exe sharing this pool wineserver."""
+        if self.max_tasks is not None:
+            self._collect()
+            # killing the server would also kill our running programs
+            if self._tasks >= self.max_tasks and not self._launchers:
+                self.stop()
+        self.start()
+        launcher = Launcher(self.context, exe, *args, **kwargs)
+        if self.max_tasks is not None:
+            launcher._pool = self
+        return launcher
+
+    def _track(self, launcher: Launcher) -> None:
+        # called by Launcher.run() once the program has been started
+        self._launchers.append(launcher)
+
+    def _collect(self) -> None:
+        # count the programs completed since the server was started
+        pending = []
+        for launcher in self._launchers:
+            if launcher.finished():
+                self._tasks += 1
+            else:
+                pending.append(launcher)
+        self._launchers = pending
+
+    def run(
+        self, exe: FilePath, *args: str, nowait: bool = False, **kwargs: Any
+    ) -> Launcher:
+        launcher = self.launcher(exe, *args, **kwargs)
+        launcher.run(nowait)
+        return launcher
+
+    def __enter__(self) -> LauncherPool:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_traceback: TracebackType | None,
+    ) -> None:
+        self.stop()
@@ -21,47 +21,64 @@
 from __future__ import annotations
 
 import logging
+import os
+import select
 import time
 from collections import namedtuple
 
 import psutil
 
-from lyndows.util import format_bytes
+from lyndows.util import bytes_unit, format_bytes
 
 logger = logging.getLogger(__name__)
 
+# sensors reported by temperatures()
+_TEMP_EXPORT = frozenset(("coretemp", "acpitz", "nvme"))
+# maximum length of a process name in /proc/<pid>/comm
+_COMM_LEN = 15
+# cpu topology does not change at runtime
+_CPU_LOGICAL = psutil.cpu_count(True)
+_CPU_PHYSICAL = psutil.cpu_count(logical=False)
+
+CpuLoads = namedtuple("cpu_loads", ["last_min", "last_5min", "last_15min"])
+CpuFreqs = namedtuple("cpu_freqs", ["percent"])
+SysMemory = namedtuple("sys_memory", ["total", "used", "free", "available"])
+SysTemperature = namedtuple("sys_temperature", ["unit", "temp", "status"])
+
 
 def cpucount():
-    return psutil.cpu_count(True)
+    return _CPU_LOGICAL
 
 
 def hyper_threading():
-    return psutil.cpu_count(True) > psutil.cpu_count(logical=False)
+    return _CPU_LOGICAL > _CPU_PHYSICAL
 
 
 def cpuloads() -> tuple[float, float, float]:
-    Loads = namedtuple("cpu_loads", ["last_min", "last_5min", "last_15min"])
-    loads = [x / psutil.cpu_count() * 100 for x in psutil.getloadavg()]
-    return Loads(loads[0], loads[1], loads[2])
+    loads = [x / _CPU_LOGICAL * 100 for x in psutil.getloadavg()]
+    return CpuLoads(loads[0], loads[1], loads[2])
 
 
 def cpufreq():
     freqs = psutil.cpu_freq(True)
-    Freqs = namedtuple("cpu_freqs", ["percent"])
-    return [
-        Freqs(int((stat.current - stat.min) / (stat.max - stat.min) * 100))  # type: ignore
-        for stat in freqs
-    ]
+    result = []
+    for stat in freqs:
+        current, fmin, fmax = stat.current, stat.min, stat.max  # type: ignore
+        # some systems (VMs) do not report min/max frequencies
+        span = fmax - fmin
+        result.append(CpuFreqs(int((current - fmin) / span * 100) if span > 0 else 0))
+    return result
 
 
 def memory():
     mem = psutil.virtual_memory()
-    sysmem = namedtuple("sys_memory", ["total", "used", "free", "available"])
-    return sysmem(
-        format_bytes(mem.total),
-        format_bytes(mem.used),
-        format_bytes(mem.free),
-        format_bytes(mem.available),
+    # format all values with the unit of the total
+    unit = bytes_unit(mem.total)
+    return SysMemory(
+        format_bytes(mem.total, unit),
+        format_bytes(mem.used, unit),
+        format_bytes(mem.free, unit),
+        format_bytes(mem.available, unit),
     )
 
 
@@ -71,8 +88,6 @@ def swap_mem():
 
 def temperatures() -> tuple[tuple[str, float, str]]:
     stats = psutil.sensors_temperatures()
-    Stat = namedtuple("sys_temperature", ["unit", "temp", "status"])
-    export = ("coretemp", "acpitz", "nvme")
     result = []
 
     def get_status(current: float, high: float | None, critical: float | None) -> str:
@@ -83,12 +98,12 @@ def temperatures() -> tuple[tuple[str, float, str]]:
         return "high" if current >= high else "normal"
 
     for name, stat in stats.items():
-        if name in export:
+        if name in _TEMP_EXPORT:
+            sensor = stat[0]
+            current = sensor.current
             result.append(
-                Stat(
-                    name,
-                    stat[0].current,
-                    get_status(stat[0].current, stat[0].high, stat[0].critical),
+                SysTemperature(
+                    name, current, get_status(current, sensor.high, sensor.critical)
                 )
             )
     return tuple(result)
@@ -99,22 +114,90 @@ def get_process_with_pid(pid: int) -> psutil.Process | None:
 
 
 def get_process_by_name(name: str) -> list(dict[str, str]):  # type: ignore
+    target = name.lower()
     return [
         p.info  # type: ignore
         for p in psutil.process_iter(["pid", "name", "username"])
-        if name.lower() == p.name().lower()
+        if (p.info["name"] or "").lower() == target  # type: ignore
     ]
 
 
+def wait_pidfd(pid: int, timeout: float | None = None) -> bool | None:
+    """Wait for a process to terminate without polling.
+
+    Block on a pidfd until the process with the given pid terminates
+    or timeout expires. The process is not reaped. This requires
+    os.pidfd_open (Linux >= 5.3, Python >= 3.9).
+
+    Args:
+        pid (int): The pid of the process to wait for.
+        timeout (float | None): Timeout in seconds, None to wait forever.
+        A negative timeout is handled as 0.
+
+    Returns:
+        bool | None: True if the process has terminated, False if timeout
+        expired, None if pidfd is not supported on this platform.
+    """
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        fd = os.pidfd_open(pid)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return None
+    try:
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        # poll() would block forever on a negative timeout
+        return bool(poller.poll(None if timeout is None else max(timeout, 0) * 1000))
+    finally:
+        os.close(fd)
+
+
+def _find_process(target: str) -> psutil.Process | None:
+    # target is a lowercased process name.
+    if not psutil.LINUX:
+        for p in psutil.process_iter(["name"]):
+            if (p.info["name"] or "").lower() == target:  # type: ignore
+                return p
+        return None
+
+    # On Linux only read /proc/<pid>/comm instead of letting psutil
+    # parse several /proc files for every process.
+    with os.scandir("/proc") as it:
+        for entry in it:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/comm", "rb") as f:
+                    comm = f.read().rstrip(b"\n").decode(errors="replace").lower()
+            except OSError:
+                continue
+            if comm == target and len(comm) < _COMM_LEN:
+                try:
+                    return psutil.Process(int(entry.name))
+                except psutil.NoSuchProcess:
+                    continue
+            elif len(comm) == _COMM_LEN and target.startswith(comm):
+                # comm may be truncated, even when equal to the target,
+                # let psutil check the full name
+                try:
+                    p = psutil.Process(int(entry.name))
+                    if p.name().lower() == target:
+                        return p
+                except psutil.Error:
+                    continue
+    return None
+
+
 # TODO: extend this, check parent, cmdline, pid, etc...
 def wait_proc(name: str, retry: int = 100, idle: float = 0.3) -> psutil.Process | None:
     i = 0
     process = None
+    target = name.lower()
     while True:
-        for p in psutil.process_iter():
-            if p.name().lower() == "cmd.exe":
-                process = p
-                break
+        process = _find_process(target)
         if process:
             break
         if i > retry:
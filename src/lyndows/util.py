@@ -19,8 +19,9 @@
 #
 from __future__ import annotations
 
-import copy
+import functools
 import logging
+import mmap
 import os
 import struct
 import sys
@@ -33,10 +34,45 @@ import psutil
 logger = logging.getLogger(__name__)
 FilePath = Union[str, Path]  # Type Aliasing
 
+# the platform can't change at runtime
+ON_WINDOWS: bool = psutil.WINDOWS
+
+# http://windowssdk.msdn.microsoft.com/en-us/library/ms646997.aspx
+_VS_VERSION_INFO_SIG = struct.pack("32s", "VS_VERSION_INFO".encode("utf-16-le"))
+_VS_FIXEDFILEINFO = struct.Struct("13I")
+
+# read size used to feed the encoding detector
+_DETECT_CHUNK = 65536
+# ascii bytes hinting at escaped (ISO-2022, HZ) or utf-16/32 encodings
+_ASCII_AMBIGUOUS = frozenset(b"\x00\x1b~")
+
+_BYTES_UNITS = ("B", "K", "M", "G", "T", "P", "E", "Z", "Y")
+
+_WIN32_EXEC_SUFFIXES = frozenset(
+    (
+        ".COM",
+        ".EXE",
+        ".BAT",
+        ".CMD",
+        ".VBS",
+        ".VBE",
+        ".JS",
+        ".JSE",
+        ".WSF",
+        ".WSH",
+        ".MSC",
+    )
+)
+
 
 # TODO: check this again...
+@functools.lru_cache(maxsize=1024)
+def _has_drive(path: str) -> bool:
+    return Path(path).drive != ""
+
+
 def is_windows_path(path: FilePath) -> bool:
-    return Path(path).drive != "" or issubclass(path.__class__, PureWindowsPath)
+    return isinstance(path, PureWindowsPath) or _has_drive(os.fspath(path))
 
 
 def is_flagexec(path: FilePath) -> bool:
@@ -54,8 +90,8 @@ def is_flagexec(path: FilePath) -> bool:
               If the file does not exist or is not a regular file, the function
               returns False.
     """
-    path = Path(path).resolve()
-    return path.is_file() and os.access(path, os.X_OK)
+    # is_file() and os.access() follow symlinks, no need to resolve the path
+    return os.path.isfile(path) and os.access(path, os.X_OK)
 
 
 def is_win32exec(path: FilePath) -> bool:
@@ -76,23 +112,11 @@ def is_win32exec(path: FilePath) -> bool:
               If the file does not exist or is not a regular file, the function
               returns False
     """
-    path = Path(path).resolve()
-    return bool(
-        path.is_file()
-        and path.suffix.upper()
-        in (
-            ".COM",
-            ".EXE",
-            ".BAT",
-            ".CMD",
-            ".VBS",
-            ".VBE",
-            ".JS",
-            ".JSE",
-            ".WSF",
-            ".WSH",
-            ".MSC",
-        )
+    # the suffix is the one of the symlink target, eg: app -> app.exe
+    path = os.path.realpath(path)
+    return (
+        os.path.splitext(path)[1].upper() in _WIN32_EXEC_SUFFIXES
+        and os.path.isfile(path)
     )
 
 
@@ -103,7 +127,7 @@ def on_windows() -> bool:
         bool: True if the current platform is Windows, False otherwise.
     """
     # return sys.platform in ["win32", "cygwin"]
-    return psutil.WINDOWS
+    return ON_WINDOWS
 
 
 def unix_only(func: Callable) -> Callable:
@@ -132,11 +156,11 @@ def unix_only(func: Callable) -> Callable:
         # If the script is running on Windows, calling the function will raise an error
         NotImplementedError: Method not available on Windows platform
     """
+    if not ON_WINDOWS:
+        return func
 
     def inner(*args, **kwargs):
-        if on_windows():
-            raise NotImplementedError("Method not available on Windows platform")
-        return func(*args, **kwargs)
+        raise NotImplementedError("Method not available on Windows platform")
 
     return inner
 
@@ -197,18 +221,29 @@ def open_guess_encoding(path: FilePath) -> str | None:
 
     Note:
         - The function assumes the file is in binary mode ("rb") for detection.
-        - For larger files, the function reads the content line by line to minimize
-          the memory usage.
+        - For larger files, the function reads the content by fixed size chunks
+          to bound the memory usage, even for files without newlines.
         - The 'get_native_path' function is called to convert the path
           to a native format.
           See 'get_native_path' function docstring for more details.
     """
-    detector = chardet.universaldetector.UniversalDetector()
     with open(path, "rb") as f:
-        for line in f:
-            detector.feed(line)
+        chunk = f.read(_DETECT_CHUNK)
+        # small plain ascii file, no need for the detector probers,
+        # unless it could be some escaped or utf-16/32 encoding.
+        if (
+            chunk
+            and len(chunk) < _DETECT_CHUNK
+            and chunk.isascii()
+            and not _ASCII_AMBIGUOUS.intersection(chunk)
+        ):
+            return "ascii"
+        detector = chardet.universaldetector.UniversalDetector()
+        while chunk:
+            detector.feed(chunk)
             if detector.done:
                 break
+            chunk = f.read(_DETECT_CHUNK)
     detector.close()
     return detector.result["encoding"] if detector.result else None
 
@@ -237,29 +272,27 @@ def get_pe_version(file: FilePath) -> str | None:
         '1.2.3.4'
 
     Note:
-        - The function reads the entire file into memory, so it may not be suitable
-          for large binaries.
+        - The file is memory mapped, so only the pages scanned for the signature
+          are read, this is suitable for large binaries.
         - The function returns None if the 'VS_VERSION_INFO' structure is not found
           or if an error occurs.
     """
     if not Path(file).is_file():
         raise FileNotFoundError()
 
-    # http://windowssdk.msdn.microsoft.com/en-us/library/ms646997.aspx
-    sig = struct.pack("32s", "VS_VERSION_INFO".encode("utf-16-le"))
     version = None
 
     # NOTE: there is a pefile module available on pypi
     #      https://github.com/erocarrera/pefile
 
-    # This pulls the whole file into memory,
-    # so not very feasible for large binaries.
     with Path(file).open("rb") as f:
-        data = f.read()
-        offset = data.find(sig)
-        if offset != -1:
-            data = data[offset + 32 : offset + 32 + (13 * 4)]
-            version_struct = struct.unpack("13I", data)
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = data.find(_VS_VERSION_INFO_SIG)
+            if offset == -1 or offset + 32 + _VS_FIXEDFILEINFO.size > len(data):
+                return None
+            version_struct = _VS_FIXEDFILEINFO.unpack_from(data, offset + 32)
             ver_ms, ver_ls = version_struct[4], version_struct[5]
             version = "%d.%d.%d.%d" % (
                 ver_ls & 0x0000FFFF,
@@ -288,22 +321,43 @@ def assert_dir(path: Path) -> Path:
     return path
 
 
+def _find_libraries(root: FilePath, libname: str) -> list[Path]:
+    # equivalent to root.glob(f"**/*{libname}*.so") without building
+    # a Path and doing a stat() for every directory entry.
+    libraries = []
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif name.endswith(".so") and libname in name[:-3]:
+                    libraries.append(Path(entry.path))
+    return libraries
+
+
 def assert_library(root: Path, libname: str) -> list[Path]:
     assert_dir(root)
-    try:
-        libraries = list(root.glob(f"**/*{libname}*.so"))
-    except IndexError as e:
-        raise ValueError(f"No {libname} library found under {root}") from e
-    else:
-        return libraries
+    libraries = _find_libraries(root, libname)
+    if not libraries:
+        raise ValueError(f"No {libname} library found under {root}")
+    return libraries
 
 
 def assert_data_dir(library: Path) -> Path:
-    libdir = assert_file(library).parent
-    while libdir != Path("/"):
-        if (libdir / "share").is_dir():
-            return libdir / "share"
-        libdir = libdir.parent
+    # climb with plain strings, one stat() per level
+    libdir = os.path.dirname(os.path.abspath(assert_file(library)))
+    parent = os.path.dirname(libdir)
+    while parent != libdir:  # stops at the filesystem root
+        share = os.path.join(libdir, "share")
+        if os.path.isdir(share):
+            return Path(share)
+        libdir, parent = parent, os.path.dirname(parent)
     raise ValueError(f"do not found data dir for library {library}")
 
 
@@ -313,6 +367,29 @@ def assert_windows_path(path: Path) -> Path:
     return path
 
 
+def _bytes_unit_index(nbytes: int) -> int:
+    # each unit is 2**10 times the previous one, so the unit index
+    # is given by the bit length of nbytes.
+    if nbytes <= 0:
+        return 0
+    return min((int(nbytes).bit_length() - 1) // 10, len(_BYTES_UNITS) - 1)
+
+
+def bytes_unit(nbytes: int) -> str:
+    """Returns the best fit unit for a bytes size.
+
+    The returned unit letter could be passed to format_bytes()
+    to format several sizes with the same unit.
+
+    Args:
+        nbytes (int): bytes size.
+
+    Returns:
+        str: unit letter, "B" for sizes lower than 1K.
+    """
+    return _BYTES_UNITS[_bytes_unit_index(nbytes)]
+
+
 def format_bytes(
     nbytes: int, unit: str | None = None, suffix: str = "b", space: bool = True
 ) -> str:
@@ -333,22 +410,19 @@ def format_bytes(
     Returns:
         str: formated string.
     """
-    units = ["B", "K", "M", "G", "T", "P", "E", "Z"]
-    factor = 1024
     space = " " if space else ""  # type: ignore
 
     if unit:
-        if unit not in units:
-            raise ValueError(f"unit {unit} shold be one of {units}")
-        res = nbytes if unit == "B" else nbytes / factor ** (units.index(unit))
+        if unit not in _BYTES_UNITS:
+            raise ValueError(f"unit {unit} shold be one of {list(_BYTES_UNITS)}")
+        index = _BYTES_UNITS.index(unit)
+        res = nbytes if index == 0 else nbytes / (1 << (10 * index))
         return f"{res:.2f}{space}{unit}{suffix}"
-    else:
-        units[0] = ""
-        for unit in units:
-            if nbytes < factor:
-                return f"{nbytes:.2f}{space}{unit}{suffix}"
-            nbytes /= factor  # type: ignore
-    return f"{nbytes:.2f}{space}Y{suffix}"
+
+    index = _bytes_unit_index(nbytes)
+    # sizes lower than 1K are written without unit letter
+    unit = _BYTES_UNITS[index] if index else ""
+    return f"{nbytes / (1 << (10 * index)):.2f}{space}{unit}{suffix}"
 
 
 def unique(seq: Sequence[Any], lifo: bool = False) -> list:
@@ -366,28 +440,41 @@ def unique(seq: Sequence[Any], lifo: bool = False) -> list:
 
     Returns:
         list: A new list containing only unique elements.
+
+    Note:
+        Elements of seq should be hashable.
     """
-    unique = []
-    _lst = list(seq[::-1]) if lifo else list(seq)
-    for v in _lst:
-        if v not in unique:
-            unique.append(v)
-    return unique[::-1] if lifo else unique
+    if lifo:
+        return list(dict.fromkeys(reversed(seq)))[::-1]
+    return list(dict.fromkeys(seq))
 
 
 class EnvMapping:
-    __slots__ = ("_lock", "_protected", "_kwargs", "__dict__")
+    __slots__ = ("_lock", "_protected", "_kwargs", "_env_cache", "__dict__")
     __list_separator = {}
+    # bumped when a list separator changes, invalidates all env caches
+    __separator_version = 0
+    # all the __slots__ names along the mro, see __init_subclass__()
+    _all_slots = frozenset(__slots__)
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._all_slots = frozenset().union(
+            *(getattr(c, "__slots__", ()) for c in cls.__mro__ if c is not object)
+        )
 
     def __init__(self, **kwargs) -> None:
         self._kwargs = kwargs
-        self._protected = []
+        self._protected = set()
         self._lock = True
+        self._env_cache = None
 
     def add_list_separator(self, attribute: str, separator: str) -> None:
         if not isinstance(separator, str) and len(separator) != 1:
             raise TypeError("Separator must be a single character")
-        EnvMapping.__list_separator[attribute] = separator
+        if EnvMapping.__list_separator.get(attribute) != separator:
+            EnvMapping.__list_separator[attribute] = separator
+            EnvMapping.__separator_version += 1
 
     def get(self, key: str, default: Any = "") -> Any:
         """Retrieve the value associated with key
@@ -425,8 +512,13 @@ class EnvMapping:
             copy of the original object.
         """
         duply = self.__class__(**self._kwargs)
-        for k, v in self.__dict__.items():
-            duply.__dict__[k] = copy.copy(v)
+        _dict = duply.__dict__
+        _dict.update(self.__dict__)
+        # immutable values can be shared, only containers need a copy
+        for k, v in _dict.items():
+            if type(v) is list or type(v) is dict:
+                _dict[k] = v.copy()
+        duply._env_cache = None
         return duply
 
     def update(
@@ -466,18 +558,24 @@ class EnvMapping:
         """
         if name not in self._protected:
             del self.__dict__[name]
+            self._env_cache = None
 
     def list(self) -> list[str]:
         return list(self.__dict__.keys())
 
     def clear(self) -> None:
         self.__dict__.clear()
+        self._env_cache = None
 
     def pop(self, name: str) -> Any:
-        return self.__dict__.pop(name)
+        value = self.__dict__.pop(name)
+        self._env_cache = None
+        return value
 
     def popitem(self) -> tuple[str, Any]:
-        return self.__dict__.popitem()
+        item = self.__dict__.popitem()
+        self._env_cache = None
+        return item
 
     def setdefault(self, name: str, default: Any = None) -> Any:
         if name in self.__dict__:
@@ -487,10 +585,9 @@ class EnvMapping:
 
     def __setattr__(self, name: str, value: Any) -> None:
         # __slots__ case
-        for _cls in self.__class__.__mro__:
-            if _cls is not object and name in _cls.__slots__:  # type: ignore
-                object.__setattr__(self, name, value)
-                return
+        if name in self._all_slots:
+            object.__setattr__(self, name, value)
+            return
         # protected attributes
         if name in self._protected and self._lock:
             raise AttributeError(
@@ -501,6 +598,12 @@ class EnvMapping:
             self._append_list(name, value)
         else:
             self.__dict__[name] = value
+        object.__setattr__(self, "_env_cache", None)
+
+    def __delattr__(self, name: str) -> None:
+        object.__delattr__(self, name)
+        if name not in self._all_slots:
+            self._env_cache = None
 
     def _append_list(self, key, values_list):
         if key in self.__dict__:
@@ -523,23 +626,41 @@ class EnvMapping:
     def env(self) -> dict[str, str]:
         """Returns this EnvMapping as environment variables.
 
+        The result is cached until an attribute is set or removed,
+        list values are always joined again since they could have
+        been modified in place.
+
         Returns:
             dict[str, str]: A dictionary containing the environment
             variables.
         """
-        hook = self.env_hook(dict(self.__dict__))
+        version = EnvMapping.__separator_version
+        separators = EnvMapping.__list_separator
+        cache = self._env_cache
+        if cache is not None and cache[0] == version:
+            _env = dict(cache[1])
+            for k, v in cache[2]:
+                _env[k] = separators.get(k, ":").join([str(p) for p in v])
+            return _env
+        if type(self).env_hook is EnvMapping.env_hook:
+            # default hook does nothing, no need for a working copy
+            variables = self.__dict__
+        else:
+            variables = self.env_hook(dict(self.__dict__))
         _env = {}
-        for k, v in hook.items():
+        lists = []
+        for k, v in variables.items():
             if isinstance(v, list):
-                separator = EnvMapping.__list_separator.get(k, ":")
-                _env[k] = separator.join([str(p) for p in v])
+                lists.append((k, v))
+                _env[k] = separators.get(k, ":").join([str(p) for p in v])
             elif isinstance(v, bool):
                 _env[k] = str(int(v))
-            elif not str(v) or v is None:
-                continue
-            else:
-                _env[k] = str(v)
-        return _env
+            elif v is not None:
+                v = str(v)
+                if v:
+                    _env[k] = v
+        self._env_cache = (version, _env, lists)
+        return dict(_env)
 
     def dump(self, file: IO[str] = sys.stdout) -> None:
         """Dump the environment variables to a file.
@@ -587,9 +708,13 @@ class EnvMapping:
         self.update(other)
 
     def __eq__(self, other: EnvMapping | dict[str, Any]) -> bool:
+        if other is self:
+            return True
         other = other.__dict__ if isinstance(other, EnvMapping) else other
         return self.__dict__ == other
 
     def __ne__(self, other: EnvMapping | dict[str, Any]) -> bool:
+        if other is self:
+            return False
         other = other.__dict__ if isinstance(other, EnvMapping) else other
         return self.__dict__ != other
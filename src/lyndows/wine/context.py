@@ -20,6 +20,8 @@
 from __future__ import annotations
 
 import logging
+import weakref
+from typing import Any
 
 from lyndows.util import EnvMapping, FilePath
 from lyndows.wine.dist import Distribution
@@ -27,11 +29,27 @@ from lyndows.wine.prefix import Prefix
 
 logger = logging.getLogger(__name__)
 
+# variables translated by WineContext.env_hook():
+# name -> (wine variable, proton variable, proton value is inverted)
+_ENV_TRANSFORMS = {
+    "ESYNC": ("WINEESYNC", "PROTON_NO_ESYNC", True),
+    "FSYNC": ("WINEFSYNC", "PROTON_NO_FSYNC", True),
+    "LARGE_ADDRESS_AWARE": (
+        "WINE_LARGE_ADDRESS_AWARE",
+        "PROTON_FORCE_LARGE_ADDRESS_AWARE",
+        False,
+    ),
+}
+
 
 class WineContext(EnvMapping):
-    __context = set()
+    __context = []
     __default = None
-    __slots__ = ("_prefix", "_dist")
+    __slots__ = ("_prefix", "_dist", "__weakref__")
+    # variables only settable while the context is unlocked
+    _PROTECTED = frozenset(
+        ("WINEDIST", "WINELOADER", "WINEPREFIX", "WINESERVER", "WINEARCH")
+    )
 
     def __init__(
         self, dist: FilePath | Distribution, prefix: FilePath | Prefix, **kwargs
@@ -43,13 +61,7 @@ class WineContext(EnvMapping):
         self._dist = dist if isinstance(dist, Distribution) else Distribution(dist)
         self._prefix = prefix if isinstance(prefix, Prefix) else Prefix(prefix)
 
-        self._protected = (
-            "WINEDIST",
-            "WINELOADER",
-            "WINEPREFIX",
-            "WINESERVER",
-            "WINEARCH",
-        )
+        self._protected = WineContext._PROTECTED
 
         # base environement variables
         self._lock = False
@@ -62,13 +74,11 @@ class WineContext(EnvMapping):
 
         # some default
         self.WINEPATH = ""
-        self.WINEDLLPATH = [
-            self.WINEDIST / "lib64" / "wine",
-            self.WINEDIST / "lib" / "wine",
-        ]
+        # paths derived from the dist are shared by its contexts
+        self.WINEDLLPATH = list(self._dist.dll_paths)
         self.WINEDLLOVERRIDES = []
-        self.PATH = [self.WINEDIST / "bin", "/usr/bin", "/bin"]
-        self.LD_LIBRARY_PATH = [self.WINEDIST / "lib64", self.WINEDIST / "lib"]
+        self.PATH = [*self._dist.bin_paths, "/usr/bin", "/bin"]
+        self.LD_LIBRARY_PATH = list(self._dist.lib_paths)
         self.TERM = "xterm"
         self.WINEDEBUG = "-all,-fixme,-server"
 
@@ -76,25 +86,33 @@ class WineContext(EnvMapping):
         self.update(kwargs)
 
     def env_hook(self, env: dict) -> dict:
-        proxy = dict(env)
-        for name, value in proxy.items():
-            if name == "ESYNC":
-                env["WINEESYNC"] = int(value)
-                if self.is_proton:
-                    env["PROTON_NO_ESYNC"] = 1 - int(value)
-                del env[name]
-            elif name == "FSYNC":
-                env["WINEFSYNC"] = int(value)
-                if self.is_proton:
-                    env["PROTON_NO_FSYNC"] = 1 - int(value)
-                del env[name]
-            elif name == "LARGE_ADDRESS_AWARE":
-                env["WINE_LARGE_ADDRESS_AWARE"] = int(value)
-                if self.is_proton:
-                    env["PROTON_FORCE_LARGE_ADDRESS_AWARE"] = int(value)
-                del env[name]
+        if _ENV_TRANSFORMS.keys().isdisjoint(env):
+            return env
+        is_proton = self.is_proton
+        for name, (wine_var, proton_var, invert) in _ENV_TRANSFORMS.items():
+            if name in env:
+                value = int(env.pop(name))
+                env[wine_var] = value
+                if is_proton:
+                    env[proton_var] = 1 - value if invert else value
         return env
 
+    def set_protected(self, name: str, value: Any) -> None:
+        """Set a protected variable.
+
+        Protected variables can't be set by assignement, this
+        method temporarily unlocks the context to set one.
+
+        Parameters:
+            name (str): The name of the protected variable.
+            value (Any): The value to set.
+        """
+        self._lock = False
+        try:
+            self.__setattr__(name, value)
+        finally:
+            self._lock = True
+
     @property
     def dist(self) -> Distribution:
         """Returns the wine dist associated with this context."""
@@ -123,8 +141,11 @@ class WineContext(EnvMapping):
             TypeError: If the argument 'context' is not an instance
             of lyndows.wine.WineContext.
         """
-        if isinstance(cls, WineContext):
-            cls.__context.add(context)
+        if isinstance(context, WineContext):
+            # registered contexts are weakly referenced, only
+            # the default one is kept alive by the registry.
+            if not any(ref() is context for ref in cls.__context):
+                cls.__context.append(weakref.ref(context))
             cls.__default = context
         else:
             raise TypeError(
@@ -147,14 +168,13 @@ class WineContext(EnvMapping):
             raise TypeError(
                 "Argument 'ctx' should be an instance of lyndows.wine.WineContext"
             )
-        cls.__context.discard(ctx)
+        # also drop the contexts that have been garbage collected
+        alive = [
+            ref for ref in cls.__context if ref() is not None and ref() is not ctx
+        ]
+        cls.__context[:] = alive
         if cls.__default is ctx:
-            if cls.__context:
-                for x in cls.__context:
-                    cls.__default = x
-                    break
-            else:
-                cls.__default = None
+            cls.__default = alive[-1]() if alive else None
 
     @classmethod
     def default_context(cls) -> WineContext | None:
@@ -168,6 +188,8 @@ class WineContext(EnvMapping):
         Returns:
             WineContext | None: An instance of a WineContext or `None` if it's failed.
         """
+        # Distribution.default() and Prefix.default() keep their result,
+        # only the context is built, so each caller gets its own.
         dist = Distribution.default()
         if dist is not None:
             if prefix := Prefix.default():
@@ -19,11 +19,11 @@
 #
 from __future__ import annotations
 
-import importlib
+import importlib.machinery
+import importlib.util
 import logging
 import os
 import sys
-from collections import OrderedDict
 from pathlib import Path
 
 from lyndows.util import (
@@ -37,28 +37,53 @@ logger = logging.getLogger(__name__)
 
 
 class Distribution:
-    _known_places = OrderedDict()
-    commands = [
-        "winecfg",
-        "uninstaller",
-        "regedit",
-        "winetricks",
-        "wineconsole",
-        "notepad",
-        "winefile",
-        "taskmgr",
-        "control",
-        "msiexec",
-    ]
-    __slots__ = ("_root", "_is_proton", "_version", "_winedist", "_proton_module")
+    _known_places = {}
+    _default = None
+    # places already found valid, failures are not kept so that
+    # a distribution installed later can still be found.
+    _valid_places = set()
+    commands = frozenset(
+        (
+            "winecfg",
+            "uninstaller",
+            "regedit",
+            "winetricks",
+            "wineconsole",
+            "notepad",
+            "winefile",
+            "taskmgr",
+            "control",
+            "msiexec",
+        )
+    )
+    __slots__ = (
+        "_root",
+        "_is_proton",
+        "_version",
+        "_winedist",
+        "_proton_module",
+        "_proton",
+        "_server",
+        "_loader",
+        "_dll_paths",
+        "_lib_paths",
+        "_bin_paths",
+    )
 
     def __init__(self, root: FilePath) -> None:
-        self._root = Path(root).expanduser().resolve()
+        self._root = Path(os.path.realpath(os.path.expanduser(root)))
         if not self._root.is_dir():
             raise NotADirectoryError("root is not a valid directory.")
 
         self._is_proton = False
         self._proton_module = None
+        # derived paths are built on first access
+        self._proton = None
+        self._server = None
+        self._loader = None
+        self._dll_paths = None
+        self._lib_paths = None
+        self._bin_paths = None
 
         if self._check_proton():
             if Distribution.validate(self._root / "dist"):
@@ -77,20 +102,43 @@ class Distribution:
 
     @classmethod
     def validate(cls, path: FilePath) -> bool:
-        path = Path(path).absolute()
+        path = os.path.abspath(path)
+        if path in Distribution._valid_places:
+            return True
+        if Distribution._validate(path):
+            Distribution._valid_places.add(path)
+            return True
+        return False
 
-        required_dirs = ("bin", "lib", "lib64", "share")
-        for _dir in required_dirs:
-            if not (path / _dir).is_dir():
-                return False
-        required_bins = (
+    @staticmethod
+    def _validate(path: str) -> bool:
+        # one directory read for the root and one for bin, entries
+        # type is known from readdir() unless they are symlinks.
+        try:
+            with os.scandir(path) as it:
+                dirs = {e.name for e in it if e.is_dir()}
+        except OSError:
+            return False
+        if not dirs.issuperset(("bin", "lib", "lib64", "share")):
+            return False
+        try:
+            with os.scandir(os.path.join(path, "bin")) as it:
+                bins = {e.name: e for e in it}
+        except OSError:
+            return False
+        for _bin in (
             "wine",
             "wine64",
             "wineserver",
             "wine-preloader",
             "wine64-preloader",
-        )
-        return all((is_flagexec(path / "bin" / _bin) for _bin in required_bins))
+        ):
+            entry = bins.get(_bin)
+            if entry is None or not entry.is_file():
+                return False
+            if not os.access(entry.path, os.X_OK):
+                return False
+        return True
 
     def _check_proton(self) -> bool:
         return is_flagexec(self._root / "proton")
@@ -109,46 +157,81 @@ class Distribution:
 
     @property
     def proton(self) -> Path | None:
-        return self._root / "proton" if self._is_proton else None
+        if self._proton is None and self._is_proton:
+            self._proton = self._root / "proton"
+        return self._proton
 
     @property
     def server(self) -> Path:
-        return self._winedist / "bin" / "wineserver"
+        if self._server is None:
+            self._server = self._winedist / "bin" / "wineserver"
+        return self._server
 
     @property
     def loader(self) -> Path:
-        return self._winedist / "bin" / "wine64"
+        if self._loader is None:
+            self._loader = self._winedist / "bin" / "wine64"
+        return self._loader
+
+    @property
+    def lib_paths(self) -> tuple[Path, ...]:
+        if self._lib_paths is None:
+            self._lib_paths = (self._winedist / "lib64", self._winedist / "lib")
+        return self._lib_paths
+
+    @property
+    def dll_paths(self) -> tuple[Path, ...]:
+        if self._dll_paths is None:
+            self._dll_paths = tuple(lib / "wine" for lib in self.lib_paths)
+        return self._dll_paths
+
+    @property
+    def bin_paths(self) -> tuple[Path, ...]:
+        if self._bin_paths is None:
+            self._bin_paths = (self._winedist / "bin",)
+        return self._bin_paths
 
     def import_proton(self):
         if self._is_proton and not self._proton_module:
-            sys.path.append(str(self.proton))
-            importlib.machinery.SOURCE_SUFFIXES.append("")  # type: ignore
-            self._proton_module = importlib.import_module("proton")
+            # the proton script has no suffix, load it with an explicit
+            # loader rather than teaching the import system about it.
+            proton = os.fspath(self.proton)
+            loader = importlib.machinery.SourceFileLoader("proton", proton)
+            spec = importlib.util.spec_from_loader("proton", loader)
+            module = importlib.util.module_from_spec(spec)  # type: ignore
+            # proton imports the modules shipped next to it
+            root = os.fspath(self._root)
+            if root not in sys.path:
+                sys.path.append(root)
+            sys.modules["proton"] = module
+            loader.exec_module(module)
+            self._proton_module = module
         return self._proton_module
 
     @staticmethod
     def check_executable(path: FilePath) -> FilePath | None:
-        path = Path(path)
         if is_windows_path(path):
             raise ValueError("path should be a native posix path")
-        if path.name in Distribution.commands:
-            return path.name
-        path = Path(path).resolve()
+        # known commands don't need any Path or filesystem access
+        name = os.path.basename(path)
+        if name in Distribution.commands:
+            return name
+        # is_win32exec() checks the suffix of the resolved path
+        path = Path(os.path.realpath(path))
         return path if is_win32exec(path) else None
 
     @staticmethod
     def _look_for() -> None:
         home = str(Path.home())
         paths = {"/usr/bin", "/usr/local/bin", "/opt/bin", f"{home}/.local/bin"}
-        envp = os.environ.get("PATH", "").split(":")
 
         # look for wine in usual paths
-        for p in envp:
-            paths.add(p)
+        paths.update(os.environ.get("PATH", "").split(":"))
         for p in paths:
-            w = Path(p) / "wine"
+            w = os.path.join(p, "wine")
             if is_flagexec(w):
-                Distribution._known_places[str(w.resolve().parent.parent)] = None
+                place = os.path.dirname(os.path.dirname(os.path.realpath(w)))
+                Distribution._known_places[place] = None
 
         # NOTE: should we add those?
         # look for proton usual depots
@@ -156,30 +239,31 @@ class Distribution:
             f"{home}/.steam/steam/compatibilitytools.d",
             f"{home}/.steam/steam/steamapps/common/Proton",
         ):
-            depot = Path(depot)
-            print(depot)
-            if depot.is_dir():
-                for d in depot.iterdir():
-                    d.resolve()
-                    Distribution._known_places[str(d)] = None
+            if os.path.isdir(depot):
+                with os.scandir(depot) as it:
+                    for d in it:
+                        Distribution._known_places[os.path.realpath(d.path)] = None
 
     @staticmethod
     def default() -> Distribution | None:
+        if Distribution._default is not None:
+            return Distribution._default
         if len(Distribution._known_places) == 0:
             Distribution._look_for()
         for place, state in Distribution._known_places.items():
-            if state is False:
-                continue
-            elif isinstance(state, Distribution):
+            if isinstance(state, Distribution):
+                Distribution._default = state
                 return state
             else:
                 try:
-                    Distribution._known_places[place] = Distribution(place)
+                    found = Distribution(place)
                 except (NotADirectoryError, AttributeError):
-                    Distribution._known_places[place] = False
+                    # not marked as failed, it will be probed again
+                    # on next call in case it has been installed since.
                     continue
                 else:
-                    return Distribution._known_places[place]
+                    Distribution._known_places[place] = Distribution._default = found
+                    return found
         return None
 
 
@@ -20,16 +20,23 @@
 from __future__ import annotations
 
 import os
-from collections import OrderedDict
+import time
 from pathlib import Path, PosixPath, PureWindowsPath
 
 import psutil
 
-from lyndows.util import FilePath, is_windows_path, mount_point
+from lyndows.util import FilePath, is_windows_path
+
+
+# seconds during which the mount table read is reused
+_PARTITIONS_TTL = 2.0
 
 
 class Prefix:
-    _known_places = OrderedDict()
+    _known_places = {}
+    _default = None
+    # (monotonic time of the read, psutil.disk_partitions())
+    _partitions = (None, [])
     __slots__ = (
         "_root",
         "_pfx",
@@ -37,11 +44,13 @@ class Prefix:
         "_dll_overrides",
         "_arch",
         "_drive_mapping",
+        "_drive_to_mount",
         "_sys_mount_points",
+        "_mount_prefixes",
     )
 
     def __init__(self, root: FilePath) -> None:
-        self._root = Path(root).expanduser().resolve()
+        self._root = Path(os.path.realpath(os.path.expanduser(root)))
         if not self._root.is_dir():
             raise NotADirectoryError("root is not a valid directory.")
 
@@ -51,9 +60,12 @@ class Prefix:
             self._pfx = self._root / "pfx"
         else:
             raise AttributeError(f"Invalid Wine Prefix for {self._root}")
-        self._drive_mapping = {}
-        self._update_drive_mapping()
-        self._sys_mount_points = {}
+        # drive mapping is only needed for path conversion,
+        # it will be computed on first use.
+        self._drive_mapping = None
+        self._drive_to_mount = None
+        self._sys_mount_points = None
+        self._mount_prefixes = None
 
     @property
     def root(self):
@@ -77,34 +89,63 @@ class Prefix:
 
     @classmethod
     def validate(cls, path: FilePath) -> bool:
-        path = Path(path).absolute()
-        if not path.is_dir():
+        # a single directory read, entries type is known
+        # from readdir() unless they are symlinks.
+        try:
+            with os.scandir(path) as it:
+                entries = {e.name: e for e in it}
+        except OSError:
             return False
-        for _dir in ("dosdevices", "drive_c"):
-            if not (path / _dir).is_dir():
+        for name in (".update-timestamp", "system.reg", "user.reg", "userdef.reg"):
+            entry = entries.get(name)
+            if entry is None or not entry.is_file():
                 return False
-        return all(
-            (path / file).is_file()
-            for file in (
-                "system.reg",
-                "user.reg",
-                "userdef.reg",
-                ".update-timestamp",
-            )
-        )
+        for name in ("dosdevices", "drive_c"):
+            entry = entries.get(name)
+            if entry is None or not entry.is_dir():
+                return False
+        return True
 
-    # FIXME:resolve ../drive_c
     def _update_drive_mapping(self):
-        devices = self._pfx / "dosdevices"
-        for dev in devices.iterdir():
-            if len(dev.name) == 2 and dev.name.endswith(":") and dev.is_symlink:
-                self._drive_mapping[str(dev.readlink())] = dev.name
+        self._drive_mapping = {}
+        self._drive_to_mount = {}
+        devices = os.fspath(self._pfx / "dosdevices")
+        with os.scandir(devices) as it:
+            for dev in it:
+                name = dev.name
+                if len(name) == 2 and name[1] == ":" and dev.is_symlink():
+                    target = os.readlink(dev.path)
+                    if not os.path.isabs(target):
+                        # eg: c: -> ../drive_c
+                        target = os.path.realpath(os.path.join(devices, target))
+                    self._drive_mapping[target] = name
+                    self._drive_to_mount[name.lower()] = target
 
         self._sys_mount_points = {
-            part.mountpoint: part.device for part in psutil.disk_partitions()
+            part.mountpoint: self._drive_mapping.get(part.mountpoint)
+            for part in Prefix._disk_partitions()
         }
-        for mnt in self._sys_mount_points:
-            self._sys_mount_points[mnt] = self._drive_mapping.get(mnt)  # type: ignore
+        # (mount point with a trailing slash, drive), longest first,
+        # so the first matching prefix is the mount point of a path.
+        self._mount_prefixes = sorted(
+            (
+                (mnt if mnt.endswith("/") else f"{mnt}/", drive)
+                for mnt, drive in self._sys_mount_points.items()
+                if drive
+            ),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+    @staticmethod
+    def _disk_partitions() -> list:
+        # the mount table is shared by all the prefixes
+        stamp, partitions = Prefix._partitions
+        now = time.monotonic()
+        if stamp is None or now - stamp >= _PARTITIONS_TTL:
+            partitions = psutil.disk_partitions()
+            Prefix._partitions = (now, partitions)
+        return partitions
 
     def get_windows_path(self, path: FilePath) -> PureWindowsPath:
         """Convert a Windows path to a native path format.
@@ -121,13 +162,14 @@ class Prefix:
         """
         if is_windows_path(path):
             return PureWindowsPath(path)
-        mnt = mount_point(path)
-        drive = self._sys_mount_points.get(str(mnt))
-        path = Path(path).expanduser().absolute()
-        if drive:
-            path = path.relative_to(mnt)
-        else:
-            drive = self._sys_mount_points.get("/")
+        if self._sys_mount_points is None:
+            self._update_drive_mapping()
+        path = os.path.abspath(os.path.expanduser(path))
+        probe = path if path.endswith("/") else f"{path}/"
+        for prefix, drive in self._mount_prefixes:
+            if probe.startswith(prefix):
+                return PureWindowsPath(f"{drive}/{path[len(prefix):]}")
+        drive = self._sys_mount_points.get("/")
         return PureWindowsPath(f"{drive}/{path}")
 
     def get_native_path(self, path: FilePath) -> Path:
@@ -144,13 +186,15 @@ class Prefix:
         """
         if not is_windows_path(path):
             return PosixPath(path)
-        path = Path(path).absolute()
-        anchor = next(
-            (mnt for mnt, drv in self._drive_mapping.items() if drv == path.drive),
-            "/",
-        )
+        if self._drive_mapping is None:
+            self._update_drive_mapping()
+        path = PureWindowsPath(path)
         # FIXME: drive letter not found case
-        return Path(anchor) / path.relative_to(Path(path.anchor))
+        anchor = self._drive_to_mount.get(path.drive.lower(), "/")
+        if not path.anchor:
+            # relative path, resolved against the current directory
+            return Path(*path.parts).absolute()
+        return Path(anchor, *path.parts[1:])
 
     @staticmethod
     def _look_for() -> None:
@@ -169,19 +213,22 @@ class Prefix:
     #      in their directory...
     @staticmethod
     def default() -> Prefix | None:
+        if Prefix._default is not None:
+            return Prefix._default
         if len(Prefix._known_places) == 0:
             Prefix._look_for()
         for place, state in Prefix._known_places.items():
-            if state is False:
-                continue
-            elif isinstance(state, Prefix):
+            if isinstance(state, Prefix):
+                Prefix._default = state
                 return state
             else:
                 try:
-                    Prefix._known_places[place] = Prefix(place)
+                    found = Prefix(place)
                 except (NotADirectoryError, AttributeError):
-                    Prefix._known_places[place] = False
+                    # not marked as failed, it will be probed again
+                    # on next call in case it has been installed since.
                     continue
                 else:
-                    return Prefix._known_places[place]
+                    Prefix._known_places[place] = Prefix._default = found
+                    return found
         return None